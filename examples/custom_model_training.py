@@ -1,7 +1,8 @@
 from imageai.Classification.Custom import ClassificationModelTrainer
 
 
-model_trainer = ClassificationModelTrainer()
-model_trainer.setModelTypeAsResNet50()
-model_trainer.setDataDirectory("idenprof")
-model_trainer.trainModel(num_experiments=200, batch_size=32)
+if __name__ == "__main__":
+    model_trainer = ClassificationModelTrainer()
+    model_trainer.setModelTypeAsResNet50()
+    model_trainer.setDataDirectory("idenprof")
+    model_trainer.trainModel(num_experiments=200, batch_size=32)
@@ -1,6 +1,8 @@
 import time, warnings
 import os
-import copy
+import inspect
+import contextlib
+import importlib.util
 import re
 import json
 from typing import List, Tuple, Union
@@ -9,18 +11,48 @@ import numpy as np
 
 import torch
 import torch.nn as nn
+import torch.distributed as dist
+from torch.cuda import amp
+from torch.nn.parallel import DistributedDataParallel
 from torch.optim import lr_scheduler
 from torchvision import datasets
 from torchvision import transforms
 from torchvision.models import mobilenet_v2, inception_v3, resnet50, densenet121
-from torchvision.models.inception import InceptionOutputs
 
-from .data_transformation import data_transforms1, data_transforms2
+from .data_transformation import data_transforms1, data_transforms2, read_rgb_image
+from .prefetcher import CUDAPrefetcher
 from .training_params import resnet50_train_params, densenet121_train_params, inception_v3_train_params, mobilenet_v2_train_params
 from tqdm import tqdm
 
 from ...backend_check.model_extension import extension_check
 
+# '.'s are no longer allowed in module names, but previous densenet layers
+# as provided by the pytorch organization has names that uses '.'s.
+_DENSENET_KEY_RE = re.compile(
+        r"^(.*denselayer\d+\.(?:norm|relu|conv))\.((?:[12])\."
+        "(?:weight|bias|running_mean|running_var))$"
+        )
+
+
+def _compile_supported() -> Tuple[bool, str]:
+    # torch.compile lowers to Triton kernels on GPU, which needs PyTorch 2.0+,
+    # a platform/python version supported by dynamo, Triton itself and a GPU
+    # of compute capability 7.0 or newer.
+    if not hasattr(torch, "compile"):
+        return False, "PyTorch 2.0 or later is required"
+    is_dynamo_supported = getattr(getattr(torch, "_dynamo", None), "is_dynamo_supported", None)
+    if is_dynamo_supported is not None and not is_dynamo_supported():
+        return False, "it is not supported on this platform or python version"
+    if importlib.util.find_spec("triton") is None:
+        return False, "Triton is not installed"
+    if torch.cuda.get_device_capability() < (7, 0):
+        return False, "a GPU with compute capability 7.0 or newer is required"
+    return True, ""
+
+
+def _rename_densenet_key(key : str) -> str:
+    res = _DENSENET_KEY_RE.match(key)
+    return res.group(1) + res.group(2) if res else key
 
 
 class ClassificationModelTrainer():
@@ -33,20 +65,78 @@ class ClassificationModelTrainer():
     def __init__(self) -> None:
         self.__model_type = ""
         self.__device = "cuda" if torch.cuda.is_available() else "cpu"
+        # NHWC lets cuDNN pick its tensor core convolution kernels
+        self.__memory_format = torch.channels_last if self.__device == "cuda" else torch.contiguous_format
         self.__data_dir = ""
         self.__data_loaders = None
+        self.__prefetch_to_device = False
         self.__class_names = None
+        self.__num_classes = None
         self.__dataset_sizes = None
         self.__dataset_name = ""
         self.__model = None
+        self.__wrapped_model = None
+        self.__ddp_model = None
         self.__optimizer = None
         self.__lr_scheduler = None
         self.__loss_fn = nn.CrossEntropyLoss()
         self.__transfer_learning_mode = "fine_tune_all"
         self.__model_path = ""
         self.__training_params = None
+        self.__mixed_precision = False
+        self.__scaler = None
+        self.__distributed = False
+        self.__local_rank = 0
+        self.__rank = 0
+        self.__owns_process_group = False
+        self.__train_sampler = None
+
+    def __init_distributed(self) -> None:
+        if not torch.cuda.is_available():
+            raise RuntimeError("Distributed training requires GPUs.")
+        if "LOCAL_RANK" not in os.environ:
+            raise RuntimeError("Distributed training must be launched with 'torchrun'.")
+        self.__local_rank = int(os.environ["LOCAL_RANK"])
+        # "cuda" now refers to this process' GPU
+        torch.cuda.set_device(self.__local_rank)
+        if not dist.is_initialized():
+            dist.init_process_group(backend="nccl")
+            self.__owns_process_group = True
+        self.__rank = dist.get_rank()
+        self.__distributed = True
+
+    def __reset_distributed(self) -> None:
+        # only tear down a process group that was created by this trainer
+        if self.__owns_process_group:
+            dist.destroy_process_group()
+        self.__owns_process_group = False
+        self.__distributed = False
+        self.__local_rank = 0
+        self.__rank = 0
+        self.__train_sampler = None
+
+    def __get_classifier(self) -> nn.Linear:
+        if self.__model_type == "mobilenet_v2":
+            return self.__model.classifier[1]
+        elif self.__model_type == "densenet121":
+            return self.__model.classifier
+        return self.__model.fc
 
-    def __set_training_param(self) -> None:
+    def __set_classifier(self, classifier : nn.Linear) -> None:
+        if self.__model_type == "mobilenet_v2":
+            self.__model.classifier[1] = classifier
+        elif self.__model_type == "densenet121":
+            self.__model.classifier = classifier
+        else:
+            self.__model.fc = classifier
+
+    def __drop_inception_aux_logits(self) -> None:
+        # the auxiliary classifier output is never used in the loss, drop
+        # the branch so it isn't computed in the forward and backward passes.
+        self.__model.aux_logits = False
+        self.__model.AuxLogits = None
+
+    def __set_training_param(self, compile_model : bool = False) -> None:
         if not self.__model_type:
             raise RuntimeError("The model type is not set!!!")
         self.__model = self.__training_params["model"]
@@ -58,27 +148,62 @@ class ClassificationModelTrainer():
 
         if self.__model_path:
             self.__set_transfer_learning_mode()
-            print("==> Transfer learning enabled")
+            if self.__rank == 0:
+                print("==> Transfer learning enabled")
         
         # change the last linear layer to have output features of
         # same size as the number of unique classes in the new
-        # dataset.
-        if self.__model_type == "mobilenet_v2":
-            in_features = self.__model.classifier[1].in_features
-            self.__model.classifier[1] = nn.Linear(in_features, len(self.__class_names))
-        elif self.__model_type == "densenet121":
-            in_features = self.__model.classifier.in_features
-            self.__model.classifier = nn.Linear(in_features, len(self.__class_names))
-        else:
-            in_features = self.__model.fc.in_features
-            self.__model.fc = nn.Linear(in_features, len(self.__class_names))
+        # dataset. A last layer that already matches is kept, so a
+        # head fine-tuned on a same sized task isn't reinitialized.
+        classifier = self.__get_classifier()
+        if classifier.out_features != self.__num_classes:
+            classifier = nn.Linear(classifier.in_features, self.__num_classes)
+            self.__set_classifier(classifier)
+
+        # the last layer stays trainable when all the other layers are frozen
+        for param in classifier.parameters():
+            param.requires_grad = True
+
+        if self.__model_type == "inception_v3":
+            self.__drop_inception_aux_logits()
+
+        self.__model.to(self.__device, memory_format=self.__memory_format)
+
+        # The wrapped model (DDP and/or torch.compile) shares its parameters with
+        # self.__model, which is kept unwrapped so that saved state dicts don't
+        # carry the 'module.' or '_orig_mod.' prefixes.
+        self.__wrapped_model = self.__model
+        self.__ddp_model = None
+        if self.__distributed:
+            self.__ddp_model = DistributedDataParallel(
+                        self.__model,
+                        device_ids=[self.__local_rank]
+                    )
+            self.__wrapped_model = self.__ddp_model
+        if compile_model and self.__device == "cuda":
+            supported, reason = _compile_supported()
+            if supported:
+                torch.set_float32_matmul_precision("high")
+                self.__wrapped_model = torch.compile(self.__wrapped_model, mode="reduce-overhead", fullgraph=False)
+            else:
+                warnings.warn(f"torch.compile is unavailable ({reason}), training without compiling the model.")
+
+        # update all the parameters in a single kernel launch when the installed
+        # PyTorch version supports it.
+        optimizer_kwargs = {}
+        if self.__device == "cuda":
+            optimizer_args = inspect.signature(optimizer).parameters
+            if "fused" in optimizer_args:
+                optimizer_kwargs["fused"] = True
+            elif "foreach" in optimizer_args:
+                optimizer_kwargs["foreach"] = True
 
-        self.__model.to(self.__device)
         self.__optimizer = optimizer(
                     self.__model.parameters(),
                     lr=lr,
                     momentum=0.9,
-                    weight_decay=weight_decay
+                    weight_decay=weight_decay,
+                    **optimizer_kwargs
                 )
         if lr_decay_rate and lr_step_size:
             self.__lr_scheduler = lr_scheduler.StepLR(
@@ -89,20 +214,21 @@ class ClassificationModelTrainer():
 
     def __set_transfer_learning_mode(self) -> None:
 
-        state_dict = torch.load(self.__model_path)
+        state_dict = torch.load(self.__model_path, map_location=self.__device)
         if self.__model_type == "densenet121":
-            # '.'s are no longer allowed in module names, but previous densenet layers
-            # as provided by the pytorch organization has names that uses '.'s.
-            pattern = re.compile(
-                    r"^(.*denselayer\d+\.(?:norm|relu|conv))\.((?:[12])\."
-                    "(?:weight|bias|running_mean|running_var))$"
-                    )
-            for key in list(state_dict.keys()):
-                res = pattern.match(key)
-                if res:
-                    new_key = res.group(1) + res.group(2)
-                    state_dict[new_key] = state_dict[key]
-                    del state_dict[key]
+            state_dict = {_rename_densenet_key(k):v for k,v in state_dict.items()}
+        elif self.__model_type == "inception_v3":
+            # models trained by ImageAI have no auxiliary classifier weights,
+            # the pretrained imagenet ones do but they are never used.
+            self.__drop_inception_aux_logits()
+            state_dict = {k:v for k,v in state_dict.items() if not k.startswith("AuxLogits.")}
+
+        # size the last layer like the checkpoint's, so models fine-tuned on
+        # a different number of classes load and a matching head is kept.
+        classifier_key = {"mobilenet_v2": "classifier.1", "densenet121": "classifier"}.get(self.__model_type, "fc")
+        classifier_weight = state_dict.get(f"{classifier_key}.weight")
+        if classifier_weight is not None and classifier_weight.shape[0] != self.__get_classifier().out_features:
+            self.__set_classifier(nn.Linear(classifier_weight.shape[1], classifier_weight.shape[0]))
 
         self.__model.load_state_dict(state_dict)
         self.__model.to(self.__device)
@@ -111,26 +237,122 @@ class ClassificationModelTrainer():
             for param in self.__model.parameters():
                 param.requires_grad = False
 
-    def __load_data(self, batch_size : int = 8) -> None:
+    def __preload_dataset(self, image_dataset : datasets.ImageFolder) -> torch.utils.data.TensorDataset:
+        # decode and transform every image once, then keep the stacked
+        # tensors resident on the training device.
+        imgs, labels = [], []
+        for img, label in tqdm(image_dataset, disable=self.__rank != 0):
+            imgs.append(img)
+            labels.append(label)
+        return torch.utils.data.TensorDataset(
+                    torch.stack(imgs).to(self.__device),
+                    torch.tensor(labels).to(self.__device)
+                )
+
+    def __load_dali_data(self, batch_size : int = 8) -> None:
+        if self.__device != "cuda":
+            raise RuntimeError("Loading data with DALI requires a GPU.")
+        try:
+            from .dali_pipeline import DALIDataLoader
+        except ImportError:
+            raise RuntimeError("Dependency error!!! NVIDIA DALI is not installed. Please install it to load data with 'use_dali=True'. See https://docs.nvidia.com/deeplearning/dali/user-guide/docs/installation.html")
+
+        crop_size, resize_size = (299, 299) if self.__model_type=="inception_v3" else (224, 256)
+        self.__data_loaders = {
+                        x:DALIDataLoader(
+                                os.path.join(self.__data_dir, x), batch_size=batch_size,
+                                train=(x=="train"),
+                                crop_size=crop_size,
+                                resize_size=resize_size,
+                                device_id=self.__local_rank,
+                                # each process trains on its own shard of the training set
+                                shard_id=self.__rank if x=="train" else 0,
+                                num_shards=dist.get_world_size() if self.__distributed and x=="train" else 1
+                            )
+                        for x in ["train", "test"]
+                    }
+        train_loader = self.__data_loaders["train"]
+        self.__dataset_sizes = {
+                        "train": len(train_loader) * batch_size if train_loader.drop_last else train_loader.num_samples,
+                        "test": self.__data_loaders["test"].num_samples
+                    }
+        # the DALI file reader labels the class folders in sorted order, like ImageFolder
+        train_dir = os.path.join(self.__data_dir, "train")
+        self.__class_names = sorted(entry.name for entry in os.scandir(train_dir) if entry.is_dir())
+        self.__num_classes = len(self.__class_names)
+        self.__dataset_name = os.path.basename(self.__data_dir.rstrip(os.path.sep))
+
+    def __load_data(self, batch_size : int = 8, preload_to_gpu : bool = False, use_dali : bool = False, num_workers : int = 0) -> None:
         
         if not self.__data_dir:
             raise RuntimeError("The dataset directory not yet set.")
+        if use_dali:
+            if preload_to_gpu:
+                raise ValueError("'preload_to_gpu' and 'use_dali' cannot be used together.")
+            self.__load_dali_data(batch_size)
+            self.__prefetch_to_device = False
+            return
         image_dataset = {
                         x:datasets.ImageFolder(
                                 os.path.join(self.__data_dir, x),
-                                data_transforms2[x] if self.__model_type=="inception_v3" else data_transforms1[x]
+                                data_transforms2[x] if self.__model_type=="inception_v3" else data_transforms1[x],
+                                loader=read_rgb_image
                             )
                         for x in ["train", "test"]
                     }
-        self.__data_loaders = {
+        class_names = image_dataset["train"].classes
+        if preload_to_gpu:
+            if self.__rank == 0:
+                print("==> Preloading dataset to device")
+            image_dataset = {x:self.__preload_dataset(image_dataset[x]) for x in ["train", "test"]}
+
+        # each process trains on its own shard of the training set
+        self.__train_sampler = torch.utils.data.DistributedSampler(image_dataset["train"]) if self.__distributed else None
+        samplers = {"train": self.__train_sampler, "test": None}
+
+        # only drop the last incomplete training batch when at least one full
+        # batch remains, so small training sets still train.
+        num_train_samples = len(samplers["train"]) if samplers["train"] is not None else len(image_dataset["train"])
+        drop_last = num_train_samples >= batch_size
+
+        if preload_to_gpu:
+            self.__data_loaders = {
+                        x:torch.utils.data.DataLoader(
+                                image_dataset[x], batch_size=batch_size,
+                                shuffle=(x=="train" and samplers[x] is None),
+                                sampler=samplers[x],
+                                num_workers=0,
+                                pin_memory=False,
+                                drop_last=(x=="train" and drop_last)
+                            )
+                        for x in ["train", "test"]
+                    }
+        else:
+            # worker processes are kept alive across epochs and prefetch
+            # ahead; these options are only valid when workers are used.
+            worker_kwargs = {"persistent_workers": True, "prefetch_factor": 4} if num_workers > 0 else {}
+            self.__data_loaders = {
                         x:torch.utils.data.DataLoader(
                                 image_dataset[x], batch_size=batch_size,
-                                shuffle=True
+                                shuffle=(x=="train" and samplers[x] is None),
+                                sampler=samplers[x],
+                                num_workers=num_workers,
+                                pin_memory=(self.__device=="cuda"),
+                                drop_last=(x=="train" and drop_last),
+                                **worker_kwargs
                             )
                         for x in ["train", "test"]
                     }
-        self.__dataset_sizes = {x:len(image_dataset[x]) for x in ["train", "test"]}
-        self.__class_names = image_dataset["train"].classes
+        # when the last incomplete training batch is dropped, only count the
+        # training samples that are actually seen in an epoch.
+        self.__dataset_sizes = {
+                        "train": len(self.__data_loaders["train"]) * batch_size if drop_last else num_train_samples,
+                        "test": len(image_dataset["test"])
+                    }
+        # batches from the preloaded dataset are already on the device
+        self.__prefetch_to_device = self.__device == "cuda" and not preload_to_gpu
+        self.__class_names = class_names
+        self.__num_classes = len(class_names)
         self.__dataset_name = os.path.basename(self.__data_dir.rstrip(os.path.sep))
 
     def setDataDirectory(self, data_directory : str = "") -> None:
@@ -211,7 +433,14 @@ class ClassificationModelTrainer():
                 batch_size : int = 8,
                 model_directory  : str = None,
                 transfer_from_model: str = None,
-                verbose : bool = True
+                verbose : bool = True,
+                use_amp : bool = True,
+                compile_model : bool = True,
+                preload_to_gpu : bool = False,
+                distributed : bool = False,
+                use_dali : bool = False,
+                grad_accum_steps : int = 1,
+                num_workers : int = 0
             ) -> None:
         
         """
@@ -221,113 +450,176 @@ class ClassificationModelTrainer():
         - model_directory: Location where json mapping and trained models will be saved
         - transfer_from_model: Path to a pre-trained imagenet model that corresponds to the training model type
         - verbose: Option to enable/disable training logs
+        - use_amp: Option to enable/disable automatic mixed precision training. Only takes effect when training on GPU
+        - compile_model: Option to enable/disable compiling the model with torch.compile. Only takes effect when training on GPU with PyTorch 2.0 or later
+        - preload_to_gpu: Option to decode the whole dataset once and keep it in GPU memory. Only suitable for small datasets, and random augmentations are applied once rather than every epoch
+        - distributed: Option to train on multiple GPUs with DistributedDataParallel. The training script must be launched with 'torchrun'
+        - use_dali: Option to decode and augment the images on GPU with NVIDIA DALI. Requires a GPU and the 'nvidia-dali' package
+        - grad_accum_steps: Number of batches whose gradients are accumulated before each weight update. The effective batch size is batch_size * grad_accum_steps
+        - num_workers: Number of worker processes used to load the images. 0 loads them in the main process. When greater than 0 on Windows or macOS, the training script must be guarded with 'if __name__ == "__main__":'
         
         :param num_experiments:
         :param batch_size:
         :model_directory:
         :transfer_from_model:
         :verbose:
+        :use_amp:
+        :compile_model:
+        :preload_to_gpu:
+        :distributed:
+        :use_dali:
+        :grad_accum_steps:
+        :num_workers:
         :return:
         """
 
-        # Load dataset
-        self.__load_data(batch_size)
-
-        # Check and effect transfer learning if enabled
-        if transfer_from_model:
-            extension_check(transfer_from_model)
-            self.__model_path = transfer_from_model
-
-        # Load training parameters for the specified model type
-        self.__set_training_param()
-
-        
-        # Create output directory to save trained models and json mappings
-        if not model_directory:
-            model_directory = os.path.join(self.__data_dir, "models")
-
-        if not os.path.exists(model_directory):
-            os.mkdir(model_directory)
-        
-        # Dump class mappings to json file
-        with open(os.path.join(model_directory, f"{self.__dataset_name}_model_classes.json"), "w") as f:
-            classes_dict = {}
-            class_list = sorted(self.__class_names)
-            for i in range(len(class_list)):
-                classes_dict[str(i)] = class_list[i]
-            json.dump(classes_dict, f)
-
-        # Prep model weights for training
-        since = time.time()
-
-        best_model_weights = copy.deepcopy(self.__model.state_dict())
-        best_acc = 0.0
-        prev_save_name, recent_save_name = "", ""
-
-        # Device check and log
-        print("=" * 50)
-        print("Training with GPU") if self.__device == "cuda" else print("Training with CPU. This might cause slower train.")
-        print("=" * 50)
-
-
-        for epoch in range(num_experiments):
-            if verbose:
-                print(f"Epoch {epoch + 1}/{num_experiments}", "-"*10, sep="\n")
-
-            # each epoch has a training and test phase
-            for phase in ["train", "test"]:
-                if phase == "train":
-                    self.__model.train()
-                else:
-                    self.__model.eval()
+        if grad_accum_steps < 1:
+            raise ValueError("'grad_accum_steps' must be at least 1.")
+        if num_workers < 0:
+            raise ValueError("'num_workers' must not be negative.")
 
-                running_loss = 0.0
-                running_corrects = 0
+        if distributed:
+            self.__init_distributed()
+        # always tear down the distributed state, even when training fails,
+        # so that later calls on this trainer don't reuse a stale rank.
+        try:
+            # only the first process logs and writes to the model directory
+            is_main_process = self.__rank == 0
+            verbose = verbose and is_main_process
 
-                # Iterate on the dataset in batches
-                for imgs, labels in tqdm(self.__data_loaders[phase]):
-                    imgs = imgs.to(self.__device)
-                    labels = labels.to(self.__device)
+            # Load dataset
+            self.__load_data(batch_size, preload_to_gpu, use_dali, num_workers)
 
-                    self.__optimizer.zero_grad()
+            # Check and effect transfer learning if enabled
+            if transfer_from_model:
+                extension_check(transfer_from_model)
+                self.__model_path = transfer_from_model
 
-                    with torch.set_grad_enabled(phase == "train"):
-                        output = self.__model(imgs)
-                        if self.__model_type == "inception_v3" and type(output) == InceptionOutputs:
-                            output = output[0]
-                        _, preds = torch.max(output, 1)
-                        loss = self.__loss_fn(output, labels)
+            # Load training parameters for the specified model type
+            self.__set_training_param(compile_model)
 
-                        if phase=="train":
-                            loss.backward()
-                            self.__optimizer.step()
-                    running_loss += loss.item() * imgs.size(0)
-                    running_corrects += torch.sum(preds==labels.data)
+            # Mixed precision is only supported on GPU, the scaler is a no-op otherwise
+            self.__mixed_precision = use_amp and self.__device == "cuda"
+            self.__scaler = amp.GradScaler(enabled=self.__mixed_precision)
 
-                # Compute accuracy and loss metrics post epoch training
-                if phase == "train" and isinstance(self.__lr_scheduler, torch.optim.lr_scheduler.StepLR):
-                    self.__lr_scheduler.step()
+        
+            # Create output directory to save trained models and json mappings
+            if not model_directory:
+                model_directory = os.path.join(self.__data_dir, "models")
+
+            if is_main_process:
+                if not os.path.exists(model_directory):
+                    os.mkdir(model_directory)
+
+                # Dump class mappings to json file
+                # the class names are already in label index order
+                with open(os.path.join(model_directory, f"{self.__dataset_name}_model_classes.json"), "w") as f:
+                    json.dump({str(i): c for i, c in enumerate(self.__class_names)}, f)
+
+            # Prep model weights for training
+            since = time.time()
+
+            best_acc = 0.0
+            prev_save_name, recent_save_name = "", ""
+
+            # Device check and log
+            if is_main_process:
+                print("=" * 50)
+                if self.__distributed:
+                    print(f"Training with {dist.get_world_size()} GPUs")
+                else:
+                    print("Training with GPU") if self.__device == "cuda" else print("Training with CPU. This might cause slower train.")
+                print("=" * 50)
 
-                epoch_loss = running_loss / self.__dataset_sizes[phase]
-                epoch_acc = running_corrects.double() / self.__dataset_sizes[phase]
+            model = self.__wrapped_model
 
+            for epoch in range(num_experiments):
                 if verbose:
-                    print(f"{phase} Loss: {epoch_loss:.4f} Accuracy: {epoch_acc:.4f}")
-                if phase == "test" and epoch_acc > best_acc:
-                    best_acc = epoch_acc
-                    recent_save_name = self.__model_type+f"-{self.__dataset_name}-test_acc_{best_acc:.5f}_epoch-{epoch}.pt"
-                    if prev_save_name:
-                        os.remove(os.path.join(model_directory, prev_save_name))
-                    best_model_weights = copy.deepcopy(self.__model.state_dict())
-                    torch.save(
-                            best_model_weights, os.path.join(model_directory, recent_save_name)
-                        )
-                    prev_save_name = recent_save_name
+                    print(f"Epoch {epoch + 1}/{num_experiments}", "-"*10, sep="\n")
+                if self.__train_sampler is not None:
+                    # reshuffle the shards every epoch
+                    self.__train_sampler.set_epoch(epoch)
+
+                # each epoch has a training and test phase
+                for phase in ["train", "test"]:
+                    if phase == "train":
+                        self.__model.train()
+                    else:
+                        self.__model.eval()
+
+                    # accumulate on device to avoid a host sync every batch
+                    running_loss = torch.zeros((), device=self.__device)
+                    running_corrects = torch.zeros((), device=self.__device, dtype=torch.long)
+
+                    data_loader = self.__data_loaders[phase]
+                    if self.__prefetch_to_device:
+                        data_loader = CUDAPrefetcher(data_loader, self.__device, self.__memory_format)
+
+                    num_batches = len(data_loader)
+                    self.__optimizer.zero_grad(set_to_none=True)
+
+                    # Iterate on the dataset in batches
+                    for batch_idx, (imgs, labels) in enumerate(tqdm(data_loader, disable=not is_main_process)):
+                        imgs = imgs.to(self.__device, non_blocking=True, memory_format=self.__memory_format)
+                        labels = labels.to(self.__device, non_blocking=True)
+
+                        # accumulate gradients over 'grad_accum_steps' batches
+                        # before updating the weights.
+                        is_update_step = (batch_idx + 1) % grad_accum_steps == 0 or (batch_idx + 1) == num_batches
+                        # the last group of an epoch can hold fewer batches, average over its real size
+                        accum_group_size = min(grad_accum_steps, num_batches - (batch_idx // grad_accum_steps) * grad_accum_steps)
+                        sync_context = contextlib.nullcontext()
+                        if phase == "train" and self.__ddp_model is not None and not is_update_step:
+                            # skip the gradient all-reduce until the update step. no_sync
+                            # only sets a flag on the DDP module, whose forward still runs
+                            # outside the compiled graph, so the compiled model is kept.
+                            sync_context = self.__ddp_model.no_sync()
+
+                        # inference mode also skips the autograd version counter and
+                        # view tracking bookkeeping during the test phase.
+                        with sync_context, torch.set_grad_enabled(True) if phase == "train" else torch.inference_mode():
+                            with amp.autocast(enabled=self.__mixed_precision):
+                                output = model(imgs)
+                                _, preds = torch.max(output, 1)
+                                loss = self.__loss_fn(output, labels)
+
+                            if phase=="train":
+                                self.__scaler.scale(loss / accum_group_size).backward()
+                                if is_update_step:
+                                    self.__scaler.step(self.__optimizer)
+                                    self.__scaler.update()
+                                    self.__optimizer.zero_grad(set_to_none=True)
+                        running_loss += loss.detach() * imgs.size(0)
+                        running_corrects += (preds == labels).sum()
+
+                    # Compute accuracy and loss metrics post epoch training
+                    if phase == "train" and isinstance(self.__lr_scheduler, torch.optim.lr_scheduler.StepLR):
+                        self.__lr_scheduler.step()
+
+                    epoch_loss = running_loss.item() / self.__dataset_sizes[phase]
+                    epoch_acc = running_corrects.item() / self.__dataset_sizes[phase]
+
+                    if verbose:
+                        print(f"{phase} Loss: {epoch_loss:.4f} Accuracy: {epoch_acc:.4f}")
+                    if phase == "test" and epoch_acc > best_acc:
+                        best_acc = epoch_acc
+                        recent_save_name = self.__model_type+f"-{self.__dataset_name}-test_acc_{best_acc:.5f}_epoch-{epoch}.pt"
+                        if is_main_process:
+                            if prev_save_name:
+                                os.remove(os.path.join(model_directory, prev_save_name))
+                            torch.save(
+                                    self.__model.state_dict(), os.path.join(model_directory, recent_save_name)
+                                )
+                        prev_save_name = recent_save_name
             
 
-        time_elapsed = time.time() - since
-        print(f"Training completed in {time_elapsed//60:.0f}m {time_elapsed % 60:.0f}s")
-        print(f"Best test accuracy: {best_acc:.4f}")
+            time_elapsed = time.time() - since
+            if is_main_process:
+                print(f"Training completed in {time_elapsed//60:.0f}m {time_elapsed % 60:.0f}s")
+                print(f"Best test accuracy: {best_acc:.4f}")
+        finally:
+            if self.__distributed:
+                self.__reset_distributed()
 
 
 class CustomImageClassification:
@@ -479,7 +771,7 @@ class CustomImageClassification:
                     in_features = self.__model.classifier[1].in_features
                     self.__model.classifier[1] = nn.Linear(in_features, len(self.__class_names))
                 elif self.__model_type == "inception_v3":
-                    self.__model = inception_v3(pretrained=False)
+                    self.__model = inception_v3(pretrained=False, aux_logits=False, init_weights=False)
                     in_features = self.__model.fc.in_features
                     self.__model.fc = nn.Linear(in_features, len(self.__class_names))
                 elif self.__model_type == "densenet121":
@@ -492,18 +784,11 @@ class CustomImageClassification:
                 state_dict = torch.load(self.__model_path, map_location=self.__device)
 
                 if self.__model_type == "densenet121":
-                    # '.'s are no longer allowed in module names, but previous densenet layers
-                    # as provided by the pytorch organization has names that uses '.'s.
-                    pattern = re.compile(
-                            r"^(.*denselayer\d+\.(?:norm|relu|conv))\.((?:[12])\."
-                                    "(?:weight|bias|running_mean|running_var))$"
-                            )
-                    for key in list(state_dict.keys()):
-                        res = pattern.match(key)
-                        if res:
-                            new_key = res.group(1) + res.group(2)
-                            state_dict[new_key] = state_dict[key]
-                            del state_dict[key]
+                    state_dict = {_rename_densenet_key(k):v for k,v in state_dict.items()}
+                elif self.__model_type == "inception_v3":
+                    # models trained with earlier versions still carry the unused
+                    # auxiliary classifier weights.
+                    state_dict = {k:v for k,v in state_dict.items() if not k.startswith("AuxLogits.")}
 
                 self.__model.load_state_dict(state_dict)
                 self.__model.to(self.__device).eval()
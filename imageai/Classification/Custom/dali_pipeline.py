@@ -0,0 +1,79 @@
+import os
+
+from nvidia.dali import fn, types, pipeline_def
+from nvidia.dali.plugin.base_iterator import LastBatchPolicy
+from nvidia.dali.plugin.pytorch import DALIClassificationIterator
+
+
+# same normalization as data_transforms1/data_transforms2, scaled to uint8 pixel values
+_MEAN = [0.485 * 255, 0.456 * 255, 0.406 * 255]
+_STD = [0.229 * 255, 0.224 * 255, 0.225 * 255]
+
+
+@pipeline_def
+def _classification_pipeline(file_root, train, crop_size, resize_size, shard_id, num_shards):
+    jpegs, labels = fn.readers.file(
+                        file_root=file_root,
+                        random_shuffle=train,
+                        shard_id=shard_id,
+                        num_shards=num_shards,
+                        name="Reader"
+                    )
+    # decode on the GPU
+    images = fn.decoders.image(jpegs, device="mixed", output_type=types.RGB)
+    if train:
+        images = fn.random_resized_crop(images, size=crop_size)
+        mirror = fn.random.coin_flip()
+    else:
+        images = fn.resize(images, resize_shorter=resize_size)
+        mirror = False
+    images = fn.crop_mirror_normalize(
+                    images,
+                    dtype=types.FLOAT,
+                    output_layout="CHW",
+                    crop=(crop_size, crop_size),
+                    mean=_MEAN,
+                    std=_STD,
+                    mirror=mirror
+                )
+    return images, labels.gpu()
+
+
+class DALIDataLoader:
+    """
+    Wraps a DALIClassificationIterator so it yields (images, labels) batches
+    already on the GPU, like a torch DataLoader would.
+    """
+
+    def __init__(self, file_root : str, batch_size : int, train : bool, crop_size : int, resize_size : int,
+                    device_id : int = 0, shard_id : int = 0, num_shards : int = 1) -> None:
+        pipe = _classification_pipeline(
+                    file_root=file_root,
+                    train=train,
+                    crop_size=crop_size,
+                    resize_size=resize_size,
+                    shard_id=shard_id,
+                    num_shards=num_shards,
+                    batch_size=batch_size,
+                    num_threads=os.cpu_count() or 4,
+                    device_id=device_id
+                )
+        pipe.build()
+        # number of images in this process' shard, split the same way as the reader does
+        total_samples = pipe.epoch_size("Reader")
+        self.num_samples = (shard_id + 1) * total_samples // num_shards - shard_id * total_samples // num_shards
+        # only drop the last incomplete training batch when at least one full batch remains
+        self.drop_last = train and self.num_samples >= batch_size
+        self.__iterator = DALIClassificationIterator(
+                    pipe,
+                    reader_name="Reader",
+                    last_batch_policy=LastBatchPolicy.DROP if self.drop_last else LastBatchPolicy.PARTIAL,
+                    auto_reset=True
+                )
+
+    def __len__(self) -> int:
+        return len(self.__iterator)
+
+    def __iter__(self):
+        for batch in self.__iterator:
+            yield batch[0]["data"], batch[0]["label"].squeeze(-1).long()
@@ -1,19 +1,44 @@
+import inspect
+
+import torch
+from PIL import Image
 from torchvision import transforms
+from torchvision.io import read_image, ImageReadMode
+
+
+def read_rgb_image(path : str) -> torch.Tensor:
+    """
+    Decodes an image file straight into a uint8 RGB tensor with torchvision's
+    native (libjpeg-turbo/libpng) decoders, skipping PIL entirely.
+    """
+    try:
+        return read_image(path, ImageReadMode.RGB)
+    except RuntimeError:
+        # formats that torchvision can't decode natively go through PIL
+        with Image.open(path) as img:
+            return transforms.functional.pil_to_tensor(img.convert("RGB"))
+
+
+# resizing tensors is only antialiased like PIL when asked to. The 'antialias'
+# argument was added to Resize and RandomResizedCrop in different torchvision
+# releases, so check each one separately.
+_resize_kwargs = {"antialias": True} if "antialias" in inspect.signature(transforms.Resize).parameters else {}
+_crop_kwargs = {"antialias": True} if "antialias" in inspect.signature(transforms.RandomResizedCrop).parameters else {}
 
 data_transforms1 = {
             "train":transforms.Compose([
-                        transforms.RandomResizedCrop(224),
+                        transforms.RandomResizedCrop(224, **_crop_kwargs),
                         transforms.RandomHorizontalFlip(),
-                        transforms.ToTensor(),
+                        transforms.ConvertImageDtype(torch.float),
                         transforms.Normalize(
                                         [0.485, 0.456, 0.406],
                                         [0.229, 0.224, 0.225]
                                     )
                     ]),
             "test": transforms.Compose([
-                        transforms.Resize(256),
+                        transforms.Resize(256, **_resize_kwargs),
                         transforms.CenterCrop(224),
-                        transforms.ToTensor(),
+                        transforms.ConvertImageDtype(torch.float),
                         transforms.Normalize(
                                         [0.485, 0.456, 0.406],
                                         [0.229, 0.224, 0.225]
@@ -23,18 +48,18 @@ data_transforms1 = {
 
 data_transforms2 = {
             "train":transforms.Compose([
-                        transforms.RandomResizedCrop(299),
+                        transforms.RandomResizedCrop(299, **_crop_kwargs),
                         transforms.RandomHorizontalFlip(),
-                        transforms.ToTensor(),
+                        transforms.ConvertImageDtype(torch.float),
                         transforms.Normalize(
                                         [0.485, 0.456, 0.406],
                                         [0.229, 0.224, 0.225]
                                     )
                     ]),
             "test": transforms.Compose([
-                        transforms.Resize(299),
+                        transforms.Resize(299, **_resize_kwargs),
                         transforms.CenterCrop(299),
-                        transforms.ToTensor(),
+                        transforms.ConvertImageDtype(torch.float),
                         transforms.Normalize(
                                         [0.485, 0.456, 0.406],
                                         [0.229, 0.224, 0.225]
@@ -0,0 +1,42 @@
+import torch
+
+
+class CUDAPrefetcher:
+    """
+    Wraps a DataLoader and copies the next batch to the GPU on a side CUDA stream
+    while the current batch is being processed, so the host to device transfer
+    overlaps with the forward and backward passes.
+    """
+
+    def __init__(self, loader : torch.utils.data.DataLoader, device : str = "cuda", memory_format : torch.memory_format = torch.contiguous_format) -> None:
+        self.__loader = loader
+        self.__device = device
+        self.__memory_format = memory_format
+        self.__stream = torch.cuda.Stream()
+
+    def __len__(self) -> int:
+        return len(self.__loader)
+
+    def __preload(self, loader_iter):
+        try:
+            imgs, labels = next(loader_iter)
+        except StopIteration:
+            return None
+        with torch.cuda.stream(self.__stream):
+            imgs = imgs.to(self.__device, non_blocking=True, memory_format=self.__memory_format)
+            labels = labels.to(self.__device, non_blocking=True)
+        return imgs, labels
+
+    def __iter__(self):
+        loader_iter = iter(self.__loader)
+        batch = self.__preload(loader_iter)
+        while batch is not None:
+            current_stream = torch.cuda.current_stream()
+            current_stream.wait_stream(self.__stream)
+            imgs, labels = batch
+            # the tensors were allocated on the side stream, make sure their memory
+            # isn't reused before the default stream is done with them.
+            imgs.record_stream(current_stream)
+            labels.record_stream(current_stream)
+            batch = self.__preload(loader_iter)
+            yield imgs, labels
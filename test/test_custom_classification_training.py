@@ -3,9 +3,11 @@ import cv2
 import shutil
 from PIL import Image
 import pytest
+import torch
 from os.path import dirname
 sys.path.insert(1, os.path.join(dirname(dirname(os.path.abspath(__file__)))))
-from imageai.Classification.Custom import ClassificationModelTrainer, CustomImageClassification
+from imageai.Classification.Custom import ClassificationModelTrainer, CustomImageClassification, _rename_densenet_key
+from imageai.Classification.Custom.data_transformation import read_rgb_image
 
 test_folder = dirname(os.path.abspath(__file__))
 
@@ -151,16 +153,18 @@ def test_inceptionv3_training(transfer_learning):
 
 
 @pytest.mark.parametrize(
-    "transfer_learning",
+    "transfer_learning, train_kwargs",
     [
         (os.path.join(
             pretrained_models_folder,
             "mobilenet_v2-b0353104.pth"
-        )),
-        (None),
+        ), {}),
+        (None, {}),
+        (None, {"preload_to_gpu": True}),
+        (None, {"grad_accum_steps": 2}),
     ]
 )
-def test_mobilenetv2_training(transfer_learning):
+def test_mobilenetv2_training(transfer_learning, train_kwargs):
 
     models_dir = os.path.join(
         classification_dataset,
@@ -177,7 +181,8 @@ def test_mobilenetv2_training(transfer_learning):
     trainer.trainModel(
         num_experiments=1,
         batch_size=2,
-        transfer_from_model=transfer_learning)
+        transfer_from_model=transfer_learning,
+        **train_kwargs)
 
     assert os.path.isdir(models_dir) == True
     assert os.path.isfile(
@@ -190,3 +195,55 @@ def test_mobilenetv2_training(transfer_learning):
         if file.endswith(".pt"):
             model_found = True
     assert model_found == True
+
+
+@pytest.mark.parametrize(
+    "grad_accum_steps",
+    [
+        (0),
+        (-1),
+    ]
+)
+def test_invalid_grad_accum_steps(grad_accum_steps):
+
+    trainer = ClassificationModelTrainer()
+    trainer.setModelTypeAsMobileNetV2()
+    trainer.setDataDirectory(data_directory=classification_dataset)
+    with pytest.raises(ValueError):
+        trainer.trainModel(
+            num_experiments=1,
+            batch_size=2,
+            grad_accum_steps=grad_accum_steps)
+
+
+@pytest.mark.parametrize(
+    "image_format",
+    [
+        ("JPEG"),
+        ("BMP"),
+    ]
+)
+def test_read_rgb_image(image_format, tmp_path):
+
+    # BMP can't be decoded by torchvision.io and falls back to PIL
+    image_path = os.path.join(tmp_path, f"image.{image_format.lower()}")
+    Image.new("L", (40, 30), color=128).save(image_path, format=image_format)
+
+    img = read_rgb_image(image_path)
+
+    assert img.dtype == torch.uint8
+    assert tuple(img.shape) == (3, 30, 40)
+
+
+@pytest.mark.parametrize(
+    "key, expected_key",
+    [
+        ("features.denseblock1.denselayer1.norm.1.weight", "features.denseblock1.denselayer1.norm1.weight"),
+        ("features.denseblock2.denselayer12.conv.2.weight", "features.denseblock2.denselayer12.conv2.weight"),
+        ("features.denseblock1.denselayer1.norm1.weight", "features.denseblock1.denselayer1.norm1.weight"),
+        ("classifier.weight", "classifier.weight"),
+    ]
+)
+def test_rename_densenet_key(key, expected_key):
+
+    assert _rename_densenet_key(key) == expected_key